@@ -10,28 +10,294 @@ Se añadió una ruta `/generate_parts` para obtener por separado la lista de
 partidos (enfrentamientos) y la tabla de horarios disponibles.  Esto
 permite que una interfaz de usuario distribuya manualmente los partidos
 arrastrándolos a los horarios deseados.
+
+La ruta `/schedule` devuelve el último fixture generado; su JSON se
+serializa una sola vez por cada fixture nuevo.
+
+Los equipos cargados y el último fixture se guardan por cliente (una cookie
+identifica a cada uno) en lugar de en variables globales compartidas.
+
+En producción se sirve con gunicorn (ver `Procfile`):
+
+    gunicorn -w 1 -k gthread --threads 8 -b 0.0.0.0:$PORT app:app
+
+El estado de cada cliente vive en la memoria del proceso, por lo que se usa
+un solo worker con varios hilos; para más workers hace falta que el balanceador
+mantenga a cada cliente en el mismo proceso.
+
+Requiere Python 3.10 o superior.
 """
 
+import io
 import os
-from flask import Flask, request, jsonify, send_file
+import re
+import secrets
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Sequence
+
+from flask import Flask, Response, g, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 
 from fixture_generator import (
+    CSV_BUFFER_SIZE,
     read_teams_from_csv,
-    generate_fixture,
-    export_to_pdf,
+    read_teams_from_stream,
+    build_schedule,
+    export_to_pdf_bytes,
     generate_timeslots_list,
     generate_match_list,
     Team,
     Match,
 )
 
+# streaming-form-data (extensión en Cython) parsea multipart mucho más rápido
+# que el parser de werkzeug.  Es opcional: si no está instalada se usa
+# request.files como antes.
+try:
+    from streaming_form_data import ParseFailedException, StreamingFormDataParser
+    from streaming_form_data.targets import BaseTarget
+except ImportError:
+    StreamingFormDataParser = None
+    BaseTarget = object
+
+# orjson (extensión en C) serializa JSON varias veces más rápido que el
+# módulo estándar.  También es opcional.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tamaño de los bloques leídos del cuerpo de la petición al parsear uploads
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Tamaño a partir del cual un upload se vuelca a disco (igual que werkzeug)
+UPLOAD_SPOOL_SIZE = 500 * 1024
+
+
+class SpooledTarget(BaseTarget):
+    """Destino de streaming-form-data que guarda el archivo en memoria o en disco.
+
+    Los uploads chicos quedan en un BytesIO y, al superar UPLOAD_SPOOL_SIZE,
+    pasan a un archivo temporal.  A diferencia de SpooledTemporaryFile, ambos
+    son objetos de `io` que TextIOWrapper acepta en cualquier versión de Python.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.file: io.BufferedIOBase = io.BytesIO()
+
+    def on_data_received(self, chunk: bytes) -> None:
+        if isinstance(self.file, io.BytesIO) and self.file.tell() + len(chunk) > UPLOAD_SPOOL_SIZE:
+            on_disk = tempfile.TemporaryFile(buffering=CSV_BUFFER_SIZE)
+            on_disk.write(self.file.getvalue())
+            self.file = on_disk
+        self.file.write(chunk)
+
+
+# Opciones de orjson equivalentes al proveedor por defecto de Flask (claves
+# ordenadas); orjson siempre produce la salida compacta
+ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que usa orjson para serializar y parsear.
+
+    Traduce los argumentos de `json.dumps` que usan Flask y Jinja (`indent=2`,
+    `separators`, `sort_keys`, `ensure_ascii`, `default`) a opciones de
+    orjson; si recibe otros, delega en el proveedor estándar.
+    """
+
+    def dumps(self, obj: any, **kwargs: any) -> str:
+        options = dict(kwargs)
+        option = ORJSON_OPTIONS
+        indent = options.pop('indent', None)
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        elif indent is not None:
+            return super().dumps(obj, **kwargs)
+        if not options.pop('sort_keys', True):
+            option &= ~orjson.OPT_SORT_KEYS
+        # orjson siempre usa separadores compactos (Flask pasa (",", ":")) y
+        # emite UTF-8 sin escapar; ambas salidas son JSON equivalente
+        options.pop('separators', None)
+        options.pop('ensure_ascii', None)
+        default = options.pop('default', self.default)
+        if options:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=default, option=option).decode('utf-8')
+
+    def loads(self, s: str | bytes, **kwargs: any) -> any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 # Crear aplicación Flask
 # Configurar Flask para servir archivos estáticos desde el directorio `templates`
 app = Flask(__name__, static_folder='templates', static_url_path='')
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+
+def _json_bytes(obj: any) -> bytes:
+    """Serializa `obj` (solo tipos JSON nativos) directamente a bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=ORJSON_OPTIONS)
+    return app.json.dumps(obj).encode('utf-8')
+
+
+@dataclass
+class ClientState:
+    """Estado de un cliente entre llamadas: equipos cargados y último fixture."""
+    teams: list[Team] = field(default_factory=list)
+    schedule: Sequence[Match] = ()
+    # Versión del fixture actual y JSON ya serializado para esa versión
+    version: int = 0
+    payload_cache: tuple[int, bytes] | None = None
+
+
+# Cada cliente se identifica con un token opaco en una cookie; se conservan
+# los estados de los últimos MAX_SESSIONS clientes.
+SESSION_COOKIE = 'fixture_session'
+MAX_SESSIONS = 256
+_sessions: OrderedDict[str, ClientState] = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def _client_state(create: bool = False) -> ClientState | None:
+    """Devuelve el estado del cliente de la petición actual.
+
+    Solo las rutas que guardan datos deben pasar `create=True`; las de
+    lectura reciben None para clientes sin sesión y no desplazan a otros.
+    """
+    if 'client_state' in g:
+        return g.client_state
+    token = request.cookies.get(SESSION_COOKIE)
+    with _sessions_lock:
+        state = _sessions.get(token) if token else None
+        if state is None:
+            if not create:
+                return None
+            token = secrets.token_urlsafe(16)
+            state = _sessions[token] = ClientState()
+            if len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+            g.new_session_token = token
+        else:
+            _sessions.move_to_end(token)
+    g.client_state = state
+    return state
+
+
+@app.after_request
+def _set_session_cookie(response: Response) -> Response:
+    """Envía la cookie de sesión a los clientes nuevos."""
+    token = g.get('new_session_token')
+    if token:
+        response.set_cookie(SESSION_COOKIE, token, httponly=True, samesite='Lax')
+    return response
+
+
+def _set_schedule(state: ClientState, schedule: Sequence[Match]) -> None:
+    """Reemplaza el fixture del cliente e invalida el JSON serializado."""
+    # Fixture y versión cambian juntos para que ningún lector los vea mezclados
+    with _sessions_lock:
+        state.schedule = schedule
+        state.version += 1
+
+
+def _schedule_response(state: ClientState) -> Response:
+    """Devuelve el fixture del cliente en JSON, serializándolo una vez por versión."""
+    # Tomar versión y fixture una sola vez: si otra petición los reemplaza
+    # durante la serialización, el JSON queda guardado bajo su propia versión
+    with _sessions_lock:
+        version, schedule = state.version, state.schedule
+    cache = state.payload_cache
+    if cache is None or cache[0] != version:
+        payload = _json_bytes({
+            "schedule": [asdict(match) for match in schedule]
+        })
+        cache = state.payload_cache = (version, payload)
+    return Response(cache[1], mimetype='application/json')
+
+
+# Campos de configuración comunes a `/generate` y `/generate_parts`:
+# (nombre, conversión, valor por defecto, mínimo para enteros)
+_CONFIG_FIELDS = (
+    ('system', str, 'rr', None),
+    ('days', int, 1, 1),
+    ('fields', int, 1, 1),
+    ('start_time', str, '09:00', None),
+    ('end_time', str, '18:00', None),
+    ('match_duration', int, 60, 1),
+    ('home_and_away', bool, False, None),
+)
+# Hora del día HH:MM (00:00 a 23:59); `end_time` admite además 24:00
+_TIME_RE = re.compile(r'([01]?\d|2[0-3]):[0-5]\d')
+
+
+def _check_min(value: int, name: str, minimum: int) -> int:
+    """Valida que `value` no sea menor que `minimum` y lo devuelve."""
+    if value < minimum:
+        raise ValueError(f"'{name}' debe ser mayor o igual a {minimum}")
+    return value
+
+
+def _check_time(value: any, name: str, allow_midnight: bool = False) -> str:
+    """Valida que `value` sea una hora HH:MM válida y la devuelve.
+
+    Con `allow_midnight=True` se acepta también 24:00 como fin de jornada.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"'{name}' debe tener formato HH:MM")
+    if not _TIME_RE.fullmatch(value) and not (allow_midnight and value == '24:00'):
+        raise ValueError(f"'{name}' debe ser una hora válida HH:MM")
+    return value
+
+
+def _check_order(start: str, end: str, name: str) -> None:
+    """Valida que la hora `end` sea posterior a `start`."""
+    start_h, start_m = map(int, start.split(':'))
+    end_h, end_m = map(int, end.split(':'))
+    if end_h * 60 + end_m <= start_h * 60 + start_m:
+        raise ValueError(f"'{name}' debe terminar después de empezar")
+
+
+def _parse_config(data: any, for_fixture: bool = True) -> dict:
+    """Valida y convierte en una sola pasada la configuración recibida en JSON.
+
+    Devuelve un diccionario con los argumentos de `generate_fixture` (salvo
+    los equipos).  Con `for_fixture=False` se omiten `rest` y
+    `max_matches_per_day`, que solo usa `/generate`.  Lanza ValueError o
+    TypeError si algún campo es inválido.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("se esperaba un objeto JSON")
+    cfg = {}
+    for name, convert, default, minimum in _CONFIG_FIELDS:
+        cfg[name] = convert(data.get(name, default))
+        if minimum is not None:
+            _check_min(cfg[name], name, minimum)
+    _check_time(cfg['start_time'], 'start_time')
+    _check_time(cfg['end_time'], 'end_time', allow_midnight=True)
+    _check_order(cfg['start_time'], cfg['end_time'], 'end_time')
+    midday_break = data.get('midday_break')
+    if midday_break and isinstance(midday_break, list) and len(midday_break) == 2:
+        cfg['midday_break'] = (_check_time(midday_break[0], 'midday_break'),
+                               _check_time(midday_break[1], 'midday_break', allow_midnight=True))
+        _check_order(*cfg['midday_break'], 'midday_break')
+    else:
+        cfg['midday_break'] = None
+    if for_fixture:
+        cfg['rest'] = _check_min(int(data.get('rest', cfg['match_duration'])), 'rest', 0)
+        max_per_day = data.get('max_matches_per_day')
+        cfg['max_matches_per_day'] = (_check_min(int(max_per_day), 'max_matches_per_day', 0)
+                                      if max_per_day is not None else None)
+    return cfg
 
-# Variables globales simples para mantener estado entre llamadas
-loaded_teams: list[Team] = []
-current_schedule: list[Match] = []
 
 # Ruta para servir la página principal y archivos estáticos
 @app.route('/')
@@ -50,6 +316,46 @@ def static_files(filename: str) -> any:
     return jsonify({"error": "Archivo no encontrado"}), 404
 
 
+def _read_uploaded_teams() -> list[Team] | None:
+    """Lee los equipos del campo 'file' del multipart sin copiarlo a disco.
+
+    Devuelve None si la petición no incluye el archivo.
+    """
+    if StreamingFormDataParser is None or request.mimetype != 'multipart/form-data':
+        file = request.files.get('file')
+        if not file:
+            return None
+        # werkzeug puede entregar un SpooledTemporaryFile, que antes de
+        # Python 3.11 no sirve para TextIOWrapper: ahí se decodifica entero
+        if sys.version_info >= (3, 11):
+            text = io.TextIOWrapper(file.stream, encoding='utf-8', newline='')
+        else:
+            text = io.StringIO(file.stream.read().decode('utf-8'), newline='')
+        return read_teams_from_stream(text)
+    target = SpooledTarget()
+    try:
+        # Un multipart mal formado (sin boundary, cuerpo inválido) se trata
+        # como una petición sin archivo, igual que con el parser de werkzeug
+        try:
+            parser = StreamingFormDataParser(headers=request.headers)
+            parser.register('file', target)
+            while True:
+                chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                parser.data_received(chunk)
+        except ParseFailedException:
+            return None
+        # Un input de archivo vacío llega con filename="": se trata como ausente
+        if not target.multipart_filename:
+            return None
+        target.file.seek(0)
+        return read_teams_from_stream(
+            io.TextIOWrapper(target.file, encoding='utf-8', newline=''))
+    finally:
+        target.file.close()
+
+
 @app.route('/import_teams', methods=['POST'])
 def import_teams() -> any:
     """Importa equipos a partir de un archivo CSV enviado en el cuerpo.
@@ -57,17 +363,12 @@ def import_teams() -> any:
     El cuerpo debe contener un archivo en multipart/form-data con el campo
     'file'.  Devuelve un JSON con la lista de equipos importados.
     """
-    global loaded_teams
-    file = request.files.get('file')
-    if not file:
+    teams = _read_uploaded_teams()
+    if teams is None:
         return jsonify({"error": "Se requiere un archivo CSV."}), 400
-    # Guardar archivo temporalmente
-    tmp_path = os.path.join('/tmp', file.filename)
-    file.save(tmp_path)
-    loaded_teams = read_teams_from_csv(tmp_path)
-    # Eliminar temporal
-    os.remove(tmp_path)
-    return jsonify({"teams": [team.__dict__ for team in loaded_teams]})
+    state = _client_state(create=True)
+    state.teams = teams
+    return jsonify({"teams": [team.__dict__ for team in state.teams]})
 
 
 @app.route('/generate', methods=['POST'])
@@ -86,53 +387,41 @@ def generate() -> any:
 
     Devuelve un listado de partidos en JSON.
     """
-    global loaded_teams, current_schedule
     data = request.get_json(force=True)
+    try:
+        cfg = _parse_config(data)
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": f"Configuración inválida: {exc}"}), 400
     # Si se proporciona archivo CSV, cargarlo
     if 'teams_csv' in data:
         csv_path = data['teams_csv']
         # Validar existencia
         if not os.path.exists(csv_path):
             return jsonify({"error": f"No se encontró el archivo {csv_path}."}), 400
-        loaded_teams = read_teams_from_csv(csv_path)
-    if not loaded_teams:
-        return jsonify({"error": "No hay equipos cargados."}), 400
-    system = data.get('system', 'rr')
-    days = int(data.get('days', 1))
-    fields = int(data.get('fields', 1))
-    start_time = data.get('start_time', '09:00')
-    end_time = data.get('end_time', '18:00')
-    match_duration = int(data.get('match_duration', 60))
-    rest = int(data.get('rest', match_duration))
-    midday_break = data.get('midday_break')
-    if midday_break and isinstance(midday_break, list) and len(midday_break) == 2:
-        midday_break_tuple = (midday_break[0], midday_break[1])
+        state = _client_state(create=True)
+        state.teams = read_teams_from_csv(csv_path)
     else:
-        midday_break_tuple = None
-    home_and_away = bool(data.get('home_and_away', False))
-    max_per_day = data.get('max_matches_per_day')
-    max_per_day_int = int(max_per_day) if max_per_day is not None else None
-    # Generar fixture
+        state = _client_state()
+    if state is None or not state.teams:
+        return jsonify({"error": "No hay equipos cargados."}), 400
+    # Generar fixture; build_schedule memoriza por equipos y configuración
+    teams_key = tuple((team.name, team.zone) for team in state.teams)
     try:
-        current_schedule = generate_fixture(
-            teams=loaded_teams,
-            system=system,
-            days=days,
-            fields=fields,
-            start_time=start_time,
-            end_time=end_time,
-            match_duration=match_duration,
-            rest=rest,
-            midday_break=midday_break_tuple,
-            home_and_away=home_and_away,
-            max_matches_per_day=max_per_day_int
-        )
+        schedule = build_schedule(teams_key, tuple(cfg.items()))
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), 400
-    # Convertir a JSON
-    return jsonify({
-        "schedule": [match.__dict__ for match in current_schedule]
-    })
+    if schedule is not state.schedule:
+        _set_schedule(state, schedule)
+    return _schedule_response(state)
+
+
+@app.route('/schedule', methods=['GET'])
+def get_schedule() -> any:
+    """Devuelve el último fixture generado sin volver a calcularlo."""
+    state = _client_state()
+    if state is None or not state.schedule:
+        return jsonify({"error": "No hay un fixture generado."}), 400
+    return _schedule_response(state)
 
 
 @app.route('/generate_parts', methods=['POST'])
@@ -149,36 +438,31 @@ def generate_parts() -> any:
 
     Devuelve un objeto JSON con claves `timeslots` y `matches`.
     """
-    global loaded_teams
     data = request.get_json(force=True)
+    try:
+        cfg = _parse_config(data, for_fixture=False)
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": f"Configuración inválida: {exc}"}), 400
     # Cargar equipos de CSV si se especifica
     if 'teams_csv' in data:
         csv_path = data['teams_csv']
         if not os.path.exists(csv_path):
             return jsonify({"error": f"No se encontró el archivo {csv_path}."}), 400
-        loaded_teams = read_teams_from_csv(csv_path)
-    if not loaded_teams:
-        return jsonify({"error": "No hay equipos cargados."}), 400
-    system = data.get('system', 'rr')
-    days = int(data.get('days', 1))
-    fields = int(data.get('fields', 1))
-    start_time = data.get('start_time', '09:00')
-    end_time = data.get('end_time', '18:00')
-    match_duration = int(data.get('match_duration', 60))
-    midday_break = data.get('midday_break')
-    if midday_break and isinstance(midday_break, list) and len(midday_break) == 2:
-        midday_break_tuple = (midday_break[0], midday_break[1])
+        state = _client_state(create=True)
+        state.teams = read_teams_from_csv(csv_path)
     else:
-        midday_break_tuple = None
-    home_and_away = bool(data.get('home_and_away', False))
+        state = _client_state()
+    if state is None or not state.teams:
+        return jsonify({"error": "No hay equipos cargados."}), 400
     # Generar lista de horarios disponibles y lista de enfrentamientos
-    timeslots = generate_timeslots_list(days=days,
-                                        fields=fields,
-                                        start_time=start_time,
-                                        end_time=end_time,
-                                        match_duration=match_duration,
-                                        midday_break=midday_break_tuple)
-    matches = generate_match_list(loaded_teams, system=system, home_and_away=home_and_away)
+    timeslots = generate_timeslots_list(days=cfg['days'],
+                                        fields=cfg['fields'],
+                                        start_time=cfg['start_time'],
+                                        end_time=cfg['end_time'],
+                                        match_duration=cfg['match_duration'],
+                                        midday_break=cfg['midday_break'])
+    matches = generate_match_list(state.teams, system=cfg['system'],
+                                  home_and_away=cfg['home_and_away'])
     return jsonify({
         "timeslots": timeslots,
         "matches": matches
@@ -191,17 +475,19 @@ def export_pdf() -> any:
 
     Se puede pasar el parámetro 'filename' como query para nombrar el archivo.
     """
-    global current_schedule
-    if not current_schedule:
+    state = _client_state()
+    if state is None or not state.schedule:
         return jsonify({"error": "No hay un fixture generado."}), 400
     filename = request.args.get('filename', 'fixture.pdf')
-    output_path = os.path.join('/tmp', filename)
-    # Generar PDF
-    export_to_pdf(current_schedule, output_path, title='Fixture generado')
-    return send_file(output_path, as_attachment=True, download_name=filename)
+    # Generar PDF en memoria y enviarlo sin pasar por disco
+    buf = io.BytesIO(export_to_pdf_bytes(state.schedule, title='Fixture generado'))
+    return send_file(buf, mimetype='application/pdf', as_attachment=True,
+                     download_name=filename)
 
 
 if __name__ == '__main__':
-    import os
+    # Servidor de desarrollo.  Para producción usar gunicorn (ver Procfile).
     port = int(os.environ.get('PORT', 3000))  # usa 3000 por defecto si no hay PORT definido
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # El modo debug (recarga automática y depurador) solo se activa con FLASK_DEBUG=1
+    debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    app.run(host='0.0.0.0', port=port, debug=debug, use_reloader=debug)
@@ -16,14 +16,15 @@ con restricciones, facilitando así la planificación manual.
 from __future__ import annotations
 
 import csv
-import datetime as _dt
+from array import array
+from bisect import bisect_left
+from itertools import groupby
 from dataclasses import dataclass, field
-from typing import List, Tuple, Dict, Optional, Iterable, Any
+from functools import lru_cache
+from typing import List, Tuple, Dict, Set, Optional, Iterable, Sequence, Any
 
-from dateutil import parser as _parser
-# La biblioteca fpdf se usa solo al exportar a PDF.  Se importa dinámicamente
-# en la función export_to_pdf para evitar que falte durante la generación
-import pandas as pd
+# Tamaño del buffer de lectura de los CSV: menos llamadas a read() por archivo
+CSV_BUFFER_SIZE = 1 << 20
 
 
 @dataclass
@@ -46,6 +47,34 @@ class Match:
     match_id: int = field(default=0)
 
 
+def read_teams_from_stream(fileobj: Iterable[str]) -> List[Team]:
+    """Lee equipos de un CSV con cabecera `Zona;Equipos` ya abierto en modo texto.
+
+    Args:
+        fileobj: Archivo o iterable de líneas de texto (por ejemplo, un upload).
+
+    Returns:
+        Lista de Team, con nombres y zonas.
+    """
+    teams: List[Team] = []
+    # csv.reader con índices de columna evita construir un dict por fila
+    reader = csv.reader(fileobj, delimiter=';')
+    header = next(reader, None)
+    if not header or 'Equipos' not in header:
+        return teams
+    name_idx = header.index('Equipos')
+    zone_idx = header.index('Zona') if 'Zona' in header else None
+    for row in reader:
+        if len(row) <= name_idx:
+            continue
+        name = row[name_idx].strip()
+        if not name:
+            continue
+        zone = row[zone_idx].strip() if zone_idx is not None and zone_idx < len(row) else ''
+        teams.append(Team(name=name, zone=zone))
+    return teams
+
+
 def read_teams_from_csv(csv_path: str) -> List[Team]:
     """Lee un archivo CSV con cabecera `Zona;Equipos` y devuelve una lista de Team.
 
@@ -55,15 +84,8 @@ def read_teams_from_csv(csv_path: str) -> List[Team]:
     Returns:
         Lista de Team, con nombres y zonas.
     """
-    teams: List[Team] = []
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter=';')
-        for row in reader:
-            zone = row.get('Zona', '').strip()
-            name = str(row.get('Equipos', '')).strip()
-            if name:
-                teams.append(Team(name=name, zone=zone))
-    return teams
+    with open(csv_path, newline="", encoding="utf-8", buffering=CSV_BUFFER_SIZE) as f:
+        return read_teams_from_stream(f)
 
 
 def assign_zones(teams: List[Team], system: str) -> List[Team]:
@@ -100,6 +122,43 @@ def assign_zones(teams: List[Team], system: str) -> List[Team]:
     return teams
 
 
+@lru_cache(maxsize=None)
+def _rr_index_schedule(n: int, home_and_away: bool = False) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    """Calcula el round robin por posiciones para `n` equipos.
+
+    El método del círculo depende solo de la cantidad de equipos, por lo que
+    el resultado se memoriza y se reutiliza entre zonas del mismo tamaño.
+
+    Args:
+        n: Número de equipos.
+        home_and_away: Si se deben jugar partidos de ida y vuelta.
+
+    Returns:
+        Rondas con tuplas (posición local, posición visitante).
+    """
+    positions = list(range(n))
+    # Añadir bye si es impar (posición n, fuera de rango)
+    if n % 2 == 1:
+        positions.append(n)
+    size = len(positions)
+    rounds: List[Tuple[Tuple[int, int], ...]] = []
+    for round_idx in range(size - 1):
+        matches: List[Tuple[int, int]] = []
+        for i in range(size // 2):
+            home = positions[i]
+            away = positions[size - 1 - i]
+            # Saltar partidos contra el bye
+            if home != n and away != n:
+                matches.append((home, away))
+        rounds.append(tuple(matches))
+        # Rotar equipos (excepto el primero)
+        positions = [positions[0]] + positions[-1:] + positions[1:-1]
+    if home_and_away:
+        # Añadir segunda vuelta invirtiendo localía
+        rounds += [tuple((away, home) for (home, away) in rnd) for rnd in rounds]
+    return tuple(rounds)
+
+
 def generate_round_robin(team_names: List[str], home_and_away: bool = False) -> List[List[Tuple[str, str]]]:
     """Genera un calendario round-robin de partidos para la lista de equipos.
 
@@ -114,37 +173,29 @@ def generate_round_robin(team_names: List[str], home_and_away: bool = False) ->
     Returns:
         Lista de rondas, cada una con una lista de tuplas (local, visitante).
     """
-    teams = list(team_names)
-    # Añadir bye si es impar
-    if len(teams) % 2 == 1:
-        teams.append('BYE')
-    n = len(teams)
-    rounds: List[List[Tuple[str, str]]] = []
-    for round_idx in range(n - 1):
-        matches: List[Tuple[str, str]] = []
-        for i in range(n // 2):
-            home = teams[i]
-            away = teams[n - 1 - i]
-            # Saltar partidos contra BYE
-            if home != 'BYE' and away != 'BYE':
-                matches.append((home, away))
-        rounds.append(matches)
-        # Rotar equipos (excepto el primero)
-        teams = [teams[0]] + teams[-1:] + teams[1:-1]
-    if home_and_away:
-        # Añadir segunda vuelta invirtiendo localía
-        return rounds + [[(away, home) for (home, away) in rnd] for rnd in rounds]
-    return rounds
+    names = list(team_names)
+    return [[(names[home], names[away]) for home, away in rnd]
+            for rnd in _rr_index_schedule(len(names), home_and_away)]
 
 
+@lru_cache(maxsize=1500)
 def _time_to_minutes(time_str: str) -> int:
-    """Convierte una cadena HH:MM a minutos desde medianoche."""
+    """Convierte una cadena HH:MM a minutos desde medianoche.
+
+    Hay a lo sumo 1440 horas distintas, así que el resultado se memoriza.
+    """
     h, m = map(int, time_str.split(':'))
     return h * 60 + m
 
 
+# Cadenas HH:MM precalculadas para cada minuto del día
+_MIN_TO_STR = [f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)]
+
+
 def _minutes_to_time(minutes: int) -> str:
     """Convierte minutos desde medianoche en cadena HH:MM."""
+    if 0 <= minutes < len(_MIN_TO_STR):
+        return _MIN_TO_STR[minutes]
     h = minutes // 60
     m = minutes % 60
     return f"{h:02d}:{m:02d}"
@@ -155,8 +206,11 @@ def _generate_timeslots(days: int,
                          start_time: str,
                          end_time: str,
                          match_duration: int,
-                         midday_break: Optional[Tuple[str, str]] = None) -> List[Tuple[int, str, str, int]]:
-    """Genera una lista de timeslots (día, hora, cancha, índice absoluto).
+                         midday_break: Optional[Tuple[str, str]] = None
+                         ) -> Tuple[array, List[str], List[str], array]:
+    """Genera los timeslots como arreglos paralelos ordenados cronológicamente.
+
+    La posición en los arreglos es el índice absoluto del timeslot.
 
     Args:
         days: Número de días del torneo.
@@ -167,7 +221,8 @@ def _generate_timeslots(days: int,
         midday_break: Tupla opcional con hora inicio y fin del descanso (HH:MM).
 
     Returns:
-        Lista de tuplas (día, hora, cancha, index) ordenadas cronológicamente.
+        Tupla (días, horas, canchas, minutos absolutos desde el inicio del
+        torneo), con un elemento por timeslot.
     """
     start_min = _time_to_minutes(start_time)
     end_min = _time_to_minutes(end_time)
@@ -175,22 +230,29 @@ def _generate_timeslots(days: int,
     if midday_break:
         break_start = _time_to_minutes(midday_break[0])
         break_end = _time_to_minutes(midday_break[1])
-    timeslots = []
-    index = 0
-    for day in range(1, days + 1):
-        current = start_min
-        while current + match_duration <= end_min:
-            # Comprobar si cae dentro del corte al mediodía
-            if break_start is not None and break_start <= current < break_end:
-                current = break_end
-                continue
-            time_str = _minutes_to_time(current)
-            for field_num in range(1, fields + 1):
-                field_name = f"c{field_num}"
-                timeslots.append((day, time_str, field_name, index))
-                index += 1
-            current += match_duration
-    return timeslots
+    # Las horas de inicio son iguales para todos los días: se calculan una
+    # sola vez y luego se combinan con días y canchas
+    day_minutes: List[int] = []
+    current = start_min
+    while current + match_duration <= end_min:
+        # Comprobar si cae dentro del corte al mediodía
+        if break_start is not None and break_start <= current < break_end:
+            current = break_end
+            continue
+        day_minutes.append(current)
+        current += match_duration
+    day_times = [_minutes_to_time(minutes) for minutes in day_minutes]
+    field_names = [f"c{field_num}" for field_num in range(1, fields + 1)]
+    # Orden cronológico: día, luego hora, luego cancha
+    slots_per_day = len(day_minutes) * fields
+    slot_days = array('i', (day for day in range(1, days + 1) for _ in range(slots_per_day)))
+    slot_times = [time_str for time_str in day_times for _ in field_names] * days
+    slot_fields = field_names * (len(day_minutes) * days)
+    abs_times = array('i', ((day - 1) * 24 * 60 + minutes
+                            for day in range(1, days + 1)
+                            for minutes in day_minutes
+                            for _ in field_names))
+    return slot_days, slot_times, slot_fields, abs_times
 
 
 # --- Nuevas funciones públicas para separar la generación del fixture ---
@@ -218,9 +280,10 @@ def generate_timeslots_list(days: int,
     Returns:
         Lista de diccionarios con claves `day`, `time`, `field` e `index`.
     """
-    raw_slots = _generate_timeslots(days, fields, start_time, end_time, match_duration, midday_break)
+    slot_days, slot_times, slot_fields, _ = _generate_timeslots(
+        days, fields, start_time, end_time, match_duration, midday_break)
     slots_list: List[Dict[str, Any]] = []
-    for day, time_str, field_name, index in raw_slots:
+    for index, (day, time_str, field_name) in enumerate(zip(slot_days, slot_times, slot_fields)):
         slots_list.append({
             "day": day,
             "time": time_str,
@@ -309,74 +372,130 @@ def generate_fixture(teams: List[Team],
     zones: Dict[str, List[Team]] = {}
     for t in teams:
         zones.setdefault(t.zone, []).append(t)
+    # Identificar equipos por índice entero para usar listas en lugar de
+    # diccionarios indexados por nombre durante la asignación
+    team_names = [t.name for t in teams]
+    team_id: Dict[str, int] = {name: i for i, name in enumerate(team_names)}
     # Generar partidos por zona
-    matches_unassigned: List[Tuple[str, str, str, int]] = []  # (zona, home, away, round)
+    matches_unassigned: List[Tuple[str, int, int, int]] = []  # (zona, home_id, away_id, round)
     for zone_name, zone_teams in zones.items():
-        team_names = [t.name for t in zone_teams]
-        rounds = generate_round_robin(team_names, home_and_away)
+        zone_ids = [team_id[t.name] for t in zone_teams]
+        rounds = _rr_index_schedule(len(zone_ids), home_and_away)
         for round_index, pairs in enumerate(rounds, start=1):
             for home, away in pairs:
-                matches_unassigned.append((zone_name, home, away, round_index))
+                matches_unassigned.append((zone_name, zone_ids[home], zone_ids[away], round_index))
     # Generar timeslots
-    timeslots = _generate_timeslots(days, fields, start_time, end_time,
-                                    match_duration, midday_break)
-    # Ordenar timeslots por índice absoluto (precalculado)
-    timeslots.sort(key=lambda x: x[3])
-    # Tracking de último partido (tiempo absoluto) por equipo
-    last_played: Dict[str, int] = {}
+    # Arreglos paralelos, ya en orden cronológico, con el minuto absoluto
+    # de cada timeslot para comparar descansos sin parsear horas
+    slot_days, slot_times, slot_fields, abs_times = _generate_timeslots(
+        days, fields, start_time, end_time, match_duration, midday_break)
+    # Índice del primer timeslot que respeta el descanso de cada equipo.
+    # Solo es válido si abs_times está ordenado; con jornadas de más de 24 h
+    # los últimos horarios de un día se solapan con el siguiente y hay que
+    # comprobar el descanso timeslot por timeslot
+    slots_sorted = all(a <= b for a, b in zip(abs_times, abs_times[1:]))
+    earliest = [0] * len(team_names)
+    last_played = [-1_000_000] * len(team_names)
     schedule: List[Match] = []
     # Convertir rest a minutos
     rest_minutes = rest
-    # Convertir timeslot a tiempo absoluto en minutos para comparaciones
-    timeslot_absolute = [((day, time_str, field), ((day - 1) * 24 * 60 + _time_to_minutes(time_str)))
-                         for (day, time_str, field, _) in timeslots]
+    # Primer índice de timeslot de cada día (day_start_idx[days + 1] es el
+    # total), para saltar de una vez los días que ya alcanzaron el máximo
+    day_start_idx = [bisect_left(slot_days, day) for day in range(days + 2)]
+    # Timeslots ya ocupados y cantidad de partidos asignados por día
+    used_slots: Set[int] = set()
+    day_counts: Dict[int, int] = {}
     # Asignar partidos secuencialmente
-    for zone, home, away, round_idx in matches_unassigned:
+    for zone, home_id, away_id, round_idx in matches_unassigned:
         assigned = False
-        for idx, ((day, time_str, field), abs_time) in enumerate(timeslot_absolute):
+        # Si los timeslots están ordenados cronológicamente, todos los que
+        # siguen al cursor de ambos equipos respetan el descanso
+        if slots_sorted:
+            idx = max(earliest[home_id], earliest[away_id])
+        else:
+            idx = 0
+        while idx < len(abs_times):
             # Comprobar si ese timeslot está libre
-            if idx in {m.match_id for m in schedule}:
+            if idx in used_slots:
+                idx += 1
                 continue
-            # Comprobar descanso para ambos equipos
-            last_home = last_played.get(home, -1_000_000)
-            last_away = last_played.get(away, -1_000_000)
-            if abs_time - last_home < rest_minutes:
-                continue
-            if abs_time - last_away < rest_minutes:
-                continue
-            # Comprobar máximo partidos por día
+            # Comprobar descanso para ambos equipos cuando no hay cursor
+            if not slots_sorted:
+                abs_time = abs_times[idx]
+                if (abs_time - last_played[home_id] < rest_minutes
+                        or abs_time - last_played[away_id] < rest_minutes):
+                    idx += 1
+                    continue
+            day = slot_days[idx]
+            # Comprobar máximo partidos por día; si está completo, pasar al siguiente
             if max_matches_per_day is not None:
-                day_matches = sum(1 for m in schedule if m.day == day)
-                if day_matches >= max_matches_per_day:
+                if day_counts.get(day, 0) >= max_matches_per_day:
+                    idx = day_start_idx[day + 1]
                     continue
             # Asignar
-            schedule.append(Match(day=day, time=time_str, field=field,
-                                  home=home, away=away,
+            schedule.append(Match(day=day, time=slot_times[idx], field=slot_fields[idx],
+                                  home=team_names[home_id], away=team_names[away_id],
                                   zone=zone, round=round_idx, match_id=idx))
-            last_played[home] = abs_time
-            last_played[away] = abs_time
+            used_slots.add(idx)
+            day_counts[day] = day_counts.get(day, 0) + 1
+            if slots_sorted:
+                next_idx = bisect_left(abs_times, abs_times[idx] + rest_minutes)
+                earliest[home_id] = next_idx
+                earliest[away_id] = next_idx
+            else:
+                last_played[home_id] = abs_times[idx]
+                last_played[away_id] = abs_times[idx]
             assigned = True
             break
         if not assigned:
             raise RuntimeError("No se pudo asignar un horario a todos los partidos.\n"
                                "Ajuste parámetros de días, canchas o descanso.")
-    # Ordenar por día, hora y cancha
-    schedule.sort(key=lambda m: (m.day, _time_to_minutes(m.time), m.field))
+    # Ordenar por día, hora y cancha; match_id aún es el índice del timeslot,
+    # así que la hora se toma de abs_times sin parsear `time`
+    schedule.sort(key=lambda m: (m.day, abs_times[m.match_id], m.field))
     # Reasignar IDs secuenciales para imprimir
     for idx, match in enumerate(schedule, start=1):
         match.match_id = idx
     return schedule
 
 
-def export_to_pdf(schedule: List[Match], output_path: str, title: Optional[str] = None) -> None:
-    """Exporta el fixture a un PDF con una tabla ordenada por día.
+@lru_cache(maxsize=32)
+def build_schedule(teams: Tuple[Tuple[str, str], ...],
+                   config: Tuple[Tuple[str, Any], ...]) -> Tuple[Match, ...]:
+    """Versión pura y memorizada de `generate_fixture`.
+
+    Recibe solo datos inmutables, de modo que las llamadas repetidas con los
+    mismos equipos y configuración devuelven el fixture ya calculado.  Los
+    Match devueltos se comparten entre llamadas y no deben modificarse.
+
+    Args:
+        teams: Tuplas (nombre, zona) de los equipos.
+        config: Pares (argumento, valor) de `generate_fixture`, sin `teams`.
+
+    Returns:
+        Tupla de Match con asignaciones de día, hora y cancha.
+    """
+    team_list = [Team(name=name, zone=zone) for name, zone in teams]
+    return tuple(generate_fixture(team_list, **dict(config)))
+
+
+# Encabezado y anchos (mm) de las columnas de la tabla del PDF
+_PDF_HEADER = ("Fecha", "Hora", "Cancha", "Local", "Visitante", "Zona", "Fase/Ronda", "ID")
+_PDF_COL_WIDTHS = (20, 15, 15, 25, 25, 10, 30, 10)
+
+
+def export_to_pdf_bytes(schedule: Sequence[Match], title: Optional[str] = None) -> bytes:
+    """Genera en memoria un PDF con una tabla ordenada por día.
 
     Args:
         schedule: Lista de Match ya asignados.
-        output_path: Ruta del archivo PDF a generar.
         title: Título opcional para el documento.
+
+    Returns:
+        Contenido del PDF generado.
     """
-    # Importar FPDF cuando sea necesario
+    # fpdf se usa solo al exportar a PDF: se importa aquí para que su
+    # ausencia no impida generar fixtures
     try:
         from fpdf import FPDF
     except ImportError as exc:
@@ -385,36 +504,36 @@ def export_to_pdf(schedule: List[Match], output_path: str, title: Optional[str]
         ) from exc
     pdf = FPDF(orientation='P', unit='mm', format='A4')
     pdf.set_auto_page_break(auto=True, margin=15)
-    current_day = None
-    for match in schedule:
-        if match.day != current_day:
-            current_day = match.day
-            pdf.add_page()
-            if title:
-                pdf.set_font("Arial", 'B', 14)
-                pdf.cell(0, 10, title, ln=True, align='C')
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(0, 8, f"Día {match.day}", ln=True)
-            # Encabezado de tabla
-            pdf.set_font("Arial", 'B', 9)
-            pdf.cell(20, 7, "Fecha", border=1)
-            pdf.cell(15, 7, "Hora", border=1)
-            pdf.cell(15, 7, "Cancha", border=1)
-            pdf.cell(25, 7, "Local", border=1)
-            pdf.cell(25, 7, "Visitante", border=1)
-            pdf.cell(10, 7, "Zona", border=1)
-            pdf.cell(30, 7, "Fase/Ronda", border=1)
-            pdf.cell(10, 7, "ID", border=1, ln=True)
-        # Datos del partido
-        pdf.set_font("Arial", '', 9)
+    # El fixture está ordenado por día: una página y una tabla por día
+    for day, day_matches in groupby(schedule, key=lambda m: m.day):
+        pdf.add_page()
+        if title:
+            pdf.set_font("Arial", 'B', 14)
+            pdf.cell(0, 10, title, ln=True, align='C')
+        pdf.set_font("Arial", 'B', 12)
+        pdf.cell(0, 8, f"Día {day}", ln=True)
         # Usar fecha ficticia: se podría mapear día a fechas reales en otra función
-        fecha = f"2025-01-{match.day:02d}"
-        pdf.cell(20, 6, fecha, border=1)
-        pdf.cell(15, 6, match.time, border=1)
-        pdf.cell(15, 6, match.field, border=1)
-        pdf.cell(25, 6, str(match.home), border=1)
-        pdf.cell(25, 6, str(match.away), border=1)
-        pdf.cell(10, 6, match.zone, border=1)
-        pdf.cell(30, 6, f"Ronda {match.round}", border=1)
-        pdf.cell(10, 6, str(match.match_id), border=1, ln=True)
-    pdf.output(output_path)
\ No newline at end of file
+        fecha = f"2025-01-{day:02d}"
+        rows = [_PDF_HEADER]
+        rows.extend((fecha, match.time, match.field, str(match.home), str(match.away),
+                     match.zone, f"Ronda {match.round}", str(match.match_id))
+                    for match in day_matches)
+        # La tabla completa se entrega de una vez a fpdf2 en lugar de celda por celda
+        pdf.set_font("Arial", '', 9)
+        with pdf.table(rows, col_widths=_PDF_COL_WIDTHS, width=sum(_PDF_COL_WIDTHS),
+                       align='LEFT', text_align='LEFT', line_height=6):
+            pass
+    # fpdf2 devuelve el documento como bytearray si no se indica un archivo
+    return bytes(pdf.output())
+
+
+def export_to_pdf(schedule: Sequence[Match], output_path: str, title: Optional[str] = None) -> None:
+    """Exporta el fixture a un PDF con una tabla ordenada por día.
+
+    Args:
+        schedule: Lista de Match ya asignados.
+        output_path: Ruta del archivo PDF a generar.
+        title: Título opcional para el documento.
+    """
+    with open(output_path, 'wb') as f:
+        f.write(export_to_pdf_bytes(schedule, title=title))
\ No newline at end of file